@@ -134,7 +134,6 @@ def verify_installation():
                 "/lib/tendrl/lib/microtetherdb/core/flush_manager.py",
                 "/lib/tendrl/lib/microtetherdb/core/future.py",
                 "/lib/tendrl/lib/microtetherdb/core/key_generator.py",
-                "/lib/tendrl/lib/microtetherdb/core/memory_file.py",
                 "/lib/tendrl/lib/microtetherdb/core/query_engine.py",
                 "/lib/tendrl/lib/microtetherdb/core/ttl_manager.py",
                 "/lib/tendrl/lib/microtetherdb/core/utils.py"
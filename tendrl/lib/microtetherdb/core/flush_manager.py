@@ -1,4 +1,4 @@
-import time
+from .utils import ticks_diff as _ticks_diff, ticks_ms as _ticks_ms
 
 
 class FlushManager:
@@ -7,51 +7,95 @@ class FlushManager:
     def __init__(self, adaptive_threshold=True, in_memory=True):
         self.adaptive_threshold = adaptive_threshold
         self.in_memory = in_memory
-        self._operation_counts = {
-            "put": 0,
-            "delete": 0,
-            "batch_put": 0,
-            "batch_delete": 0
-        }
+        self._put_count = 0
+        self._delete_count = 0
+        self._batch_put_count = 0
+        self._batch_delete_count = 0
+        self._total_ops = 0  # Running sum of the four counts above
+        self._file_threshold = 10  # Adaptive file threshold, stepped as _total_ops grows
         self._flush_counter = 0
-        self._flush_threshold = 10  # Keep lower flush threshold
-        self._last_flush_time = time.time()
+        self._flush_threshold = 32  # Base threshold; sets _effective_threshold
+        self._last_flush_ticks = _ticks_ms()
         # Smart auto-flush: memory doesn't need aggressive time-based flushing
-        self._auto_flush_seconds = 10 if self.in_memory else 5
+        self._auto_flush_ms = 10000 if self.in_memory else 5000
     
+    @property
+    def _flush_threshold(self):
+        return self._base_threshold
+
+    @_flush_threshold.setter
+    def _flush_threshold(self, value):
+        self._base_threshold = value
+        self._update_threshold()
+
+    def _update_threshold(self):
+        """Recompute the cached threshold; only runs when one of its inputs changes"""
+        self._effective_threshold = self.get_adaptive_flush_threshold()
+
     def get_adaptive_flush_threshold(self):
         """Calculate adaptive flush threshold based on operation patterns"""
         if not self.adaptive_threshold:
-            return self._flush_threshold
+            return self._base_threshold
         
         # For in-memory operations, use moderate threshold for better individual performance
         # BytesIO doesn't need as aggressive flushing as VFS systems
         if self.in_memory:
-            return max(5, self._flush_threshold // 2)  # Moderate threshold
+            return max(5, self._base_threshold // 2)  # Moderate threshold
         
-        # Calculate based on operation counts for file operations
-        total_ops = sum(self._operation_counts.values())
-        if total_ops < 100:
-            return 10
-        elif total_ops < 1000:
-            return 15
-        else:
-            return 20
+        # File operations: 10 below 100 ops, 15 below 1000, then 20
+        return self._file_threshold
     
     def should_flush(self, additional_ops=1):
         """Check if database should be flushed based on counters and time"""
-        current_time = time.time()
-        effective_threshold = self.get_adaptive_flush_threshold()
-        
-        return (
-            (self._flush_counter + additional_ops) >= effective_threshold or
-            current_time - self._last_flush_time >= self._auto_flush_seconds
-        )
+        if (self._flush_counter + additional_ops) >= self._effective_threshold:
+            return True
+        # Only read the clock when the cheap counter test doesn't decide
+        elapsed = _ticks_diff(_ticks_ms(), self._last_flush_ticks)
+        # A gap past half the ticks period (~6.2 days) wraps negative; it is overdue
+        return elapsed < 0 or elapsed >= self._auto_flush_ms
     
     def record_operation(self, operation_type, count=1):
         """Record an operation for counting and flush decision making"""
-        if operation_type in self._operation_counts:
-            self._operation_counts[operation_type] += 1
+        if operation_type == "put":
+            self.record_put()
+        elif operation_type == "delete":
+            self.record_delete()
+        elif operation_type == "batch_put":
+            self.record_batch_put(count)
+        elif operation_type == "batch_delete":
+            self.record_batch_delete(count)
+        else:
+            self._flush_counter += count
+
+    def record_put(self):
+        """Record a single put"""
+        self._put_count += 1
+        self._add_ops(1)
+
+    def record_delete(self):
+        """Record a single delete"""
+        self._delete_count += 1
+        self._add_ops(1)
+
+    def record_batch_put(self, count):
+        """Record a batch put of count items"""
+        self._batch_put_count += 1
+        self._add_ops(count)
+
+    def record_batch_delete(self, count):
+        """Record a batch delete of count items"""
+        self._batch_delete_count += 1
+        self._add_ops(count)
+
+    def _add_ops(self, count):
+        """Count one recorded operation and count writes toward the next flush"""
+        self._total_ops += 1
+        if self._total_ops == 100:
+            self._file_threshold = 15
+            self._update_threshold()
+        elif self._total_ops == 1000:
+            self._file_threshold = 20
+            self._update_threshold()
         self._flush_counter += count
     
     def flush_if_needed(self, db, force=False):
@@ -59,19 +103,24 @@ class FlushManager:
         if force or self.should_flush():
             db.flush()
             self._flush_counter = 0
-            self._last_flush_time = time.time()
+            self._last_flush_ticks = _ticks_ms()
             return True
         return False
     
     def reset_counters(self):
         """Reset flush counters (used after manual flush)"""
         self._flush_counter = 0
-        self._last_flush_time = time.time()
+        self._last_flush_ticks = _ticks_ms()
     
     @property
     def operation_counts(self):
         """Get current operation counts"""
-        return self._operation_counts.copy()
+        return {
+            "put": self._put_count,
+            "delete": self._delete_count,
+            "batch_put": self._batch_put_count,
+            "batch_delete": self._batch_delete_count
+        }
     
     @property
     def flush_counter(self):
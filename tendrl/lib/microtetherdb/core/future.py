@@ -4,19 +4,27 @@ class Future:
         self._result = None
         self._exception = None
         self._done = False
-        self._callbacks = []
+        self._callbacks = None  # None, a single callable, or a list of them
+
+    def _run_callbacks(self):
+        callbacks = self._callbacks
+        if callbacks is None:
+            return
+        if isinstance(callbacks, list):
+            for callback in callbacks:
+                callback(self)
+        else:
+            callbacks(self)
 
     def set_result(self, result):
         self._result = result
         self._done = True
-        for callback in self._callbacks:
-            callback(self)
+        self._run_callbacks()
 
     def set_exception(self, exception):
         self._exception = exception
         self._done = True
-        for callback in self._callbacks:
-            callback(self)
+        self._run_callbacks()
 
     def done(self):
         return self._done
@@ -29,12 +37,26 @@ class Future:
     def add_done_callback(self, fn):
         if self._done:
             fn(self)
-        else:
+        elif self._callbacks is None:
+            self._callbacks = fn
+        elif isinstance(self._callbacks, list):
             self._callbacks.append(fn)
+        else:
+            self._callbacks = [self._callbacks, fn]
 
     def __iter__(self):
-        yield self
-        return self.result()
+        # The future is its own iterator, so awaiting it allocates no generator
+        return self
+
+    __await__ = __iter__
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, value):
+        if self._done:
+            raise StopIteration(self.result())
+        return self
 
-    def __await__(self):
-        return self.__iter__() 
\ No newline at end of file
+    def throw(self, exc_type, exc_value=None, traceback=None):
+        raise exc_value if exc_value is not None else exc_type 
\ No newline at end of file
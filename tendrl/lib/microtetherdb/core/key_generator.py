@@ -1,15 +1,53 @@
 import time
 import random
 
+_SEQ_LIMIT = 1000000
+_time = time.time  # Bound once; saves a module attribute lookup per key
+
+# Seeded randomly so a restart inside the same second rarely replays suffixes;
+# file-backed databases still probe, since a clockless board can repeat them
+_key_seq = random.getrandbits(16)
+
+
+def _parse_ttl_fields(key):
+    """(timestamp, ttl) from a "ts:ttl:id" key without splitting it into a list"""
+    i = key.find(":")
+    j = key.find(":", i + 1)
+    if i < 0 or j < 0 or key.find(":", j + 1) >= 0:
+        raise ValueError("Not a ts:ttl:id key")
+    return int(key[:i]), int(key[i + 1:j])
+
 
 class KeyGenerator:
     
     @staticmethod
-    def generate_key(ttl=0):
-        current_time = int(time.time())
-        unique_id = random.getrandbits(16)
-        ttl = int(ttl) if ttl is not None else 0
-        return f"{current_time}:{ttl}:{unique_id}"
+    def generate_key(ttl=0, now=None):
+        # Fixed-width fields keep keys sorted by timestamp; the counter is unique
+        # within this process only, so keys persisted by an earlier boot can repeat
+        global _key_seq
+        _key_seq = (_key_seq + 1) % _SEQ_LIMIT
+        current_time = int(_time() if now is None else now)
+        if ttl is None:
+            ttl = 0
+        elif type(ttl) is not int:
+            ttl = int(ttl)  # Ints, the usual case, skip the conversion call
+        return "%010d:%06d:%06d" % (current_time, ttl, _key_seq)
+    
+    @staticmethod
+    def generate_keys(count, ttl=0, now=None):
+        """Generate count keys sharing one timestamp and TTL prefix"""
+        global _key_seq
+        current_time = int(_time() if now is None else now)
+        if ttl is None:
+            ttl = 0
+        elif type(ttl) is not int:
+            ttl = int(ttl)
+        prefix = "%010d:%06d:" % (current_time, ttl)
+        keys = []
+        for _ in range(count):
+            _key_seq = (_key_seq + 1) % _SEQ_LIMIT
+            keys.append(prefix + "%06d" % _key_seq)
+        return keys
     
     @staticmethod
     def parse_key(key):
@@ -25,4 +63,8 @@ class KeyGenerator:
     
     @staticmethod
     def validate_key(key):
-        return KeyGenerator.parse_key(key) is not None 
\ No newline at end of file
+        try:
+            _parse_ttl_fields(key)
+            return True
+        except ValueError:
+            return False 
\ No newline at end of file
@@ -2,16 +2,70 @@ import json
 
 import btree
 
+from .utils import decode_value
+
+
+def _walk(doc, path):
+    """Resolve a pre-split field path against a document"""
+    value = doc
+    for part in path:
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def _getter(path):
+    """Build the per-row lookup for a pre-split path once per query"""
+    if len(path) == 1:
+        name = path[0]
+        return lambda doc: doc.get(name) if isinstance(doc, dict) else None
+    if len(path) == 2:
+        outer, inner = path
+
+        def get_nested(doc):
+            if isinstance(doc, dict):
+                doc = doc.get(outer)
+                if isinstance(doc, dict):
+                    return doc.get(inner)
+            return None
+        return get_nested
+    return lambda doc: _walk(doc, path)  # Deeper paths are rare; walk them
+
+
+def _plain_needle(value, quoted):
+    """Encoded form of a string that appears verbatim in its stored JSON, else None"""
+    if not isinstance(value, str):
+        return None
+    encoded = json.dumps(value)
+    if encoded[1:-1] != value:
+        return None  # Needs escaping, so the raw bytes can't be matched literally
+    return (encoded if quoted else value).encode()
+
+
+def _may_match(raw_data, needles):
+    """Every needle group must have at least one member present in the raw row"""
+    for group in needles:
+        for needle in group:
+            if needle in raw_data:
+                break
+        else:
+            return False
+    return True
+
 
 class QueryEngine:
     """Handles query operations for the database"""
-    
+
     @staticmethod
     def get_field_value(doc, field):
         """Get nested field value from document using dot notation"""
         if "." not in field:
             return doc.get(field)
-        
+
         parts = field.split(".")
         value = doc
         for part in parts:
@@ -22,91 +76,144 @@ class QueryEngine:
             if value is None:
                 return None
         return value
-    
+
     @staticmethod
-    def matches_query(doc, query_dict):
-        """Check if document matches query conditions"""
+    def compile_operator(path, op, value):
+        """Build a predicate for a single operator, or None for unknown operators"""
+        get = _getter(path)
+        if op == "$eq":
+            return lambda doc: get(doc) == value
+        if op == "$ne":
+            return lambda doc: get(doc) != value
+        if op == "$gt":
+            def gt(doc):
+                doc_value = get(doc)
+                return doc_value is not None and doc_value > value
+            return gt
+        if op == "$gte":
+            def gte(doc):
+                doc_value = get(doc)
+                return doc_value is not None and doc_value >= value
+            return gte
+        if op == "$lt":
+            def lt(doc):
+                doc_value = get(doc)
+                return doc_value is not None and doc_value < value
+            return lt
+        if op == "$lte":
+            def lte(doc):
+                doc_value = get(doc)
+                return doc_value is not None and doc_value <= value
+            return lte
+        if op == "$in":
+            if not isinstance(value, (list, tuple, set)):
+                return lambda doc: get(doc) in value  # e.g. a substring test on a str
+            try:
+                members = set(value)  # Hash lookup per row instead of a list scan
+            except TypeError:
+                return lambda doc: get(doc) in value  # Unhashable members
+            def in_set(doc):
+                try:
+                    return get(doc) in members
+                except TypeError:
+                    return False  # Lists/dicts can't equal any hashable member
+            return in_set
+        if op == "$exists":
+            return lambda doc: (get(doc) is not None) == value
+        if op == "$contains":
+            def contains(doc):
+                doc_value = get(doc)
+                return isinstance(doc_value, (str, list)) and value in doc_value
+            return contains
+        return None
+
+    @staticmethod
+    def compile_query(query_dict):
+        """Compile query conditions once into (predicates, limit)"""
+        predicates = []
         for field, condition in query_dict.items():
             if field.startswith("$"):
                 continue  # Skip special operators like $limit
-                
-            doc_value = QueryEngine.get_field_value(doc, field)
-            
+
+            path = tuple(field.split("."))
             if isinstance(condition, dict):
-                # Handle operators
                 for op, value in condition.items():
-                    if op == "$eq":
-                        if doc_value != value:
-                            return False
-                    elif op == "$gt":
-                        if doc_value is None or doc_value <= value:
-                            return False
-                    elif op == "$gte":
-                        if doc_value is None or doc_value < value:
-                            return False
-                    elif op == "$lt":
-                        if doc_value is None or doc_value >= value:
-                            return False
-                    elif op == "$lte":
-                        if doc_value is None or doc_value > value:
-                            return False
-                    elif op == "$in":
-                        if doc_value not in value:
-                            return False
-                    elif op == "$ne":
-                        if doc_value == value:
-                            return False
-                    elif op == "$exists":
-                        field_exists = doc_value is not None
-                        if field_exists != value:
-                            return False
-                    elif op == "$contains":
-                        if doc_value is None:
-                            return False
-                        if isinstance(doc_value, str):
-                            if value not in doc_value:
-                                return False
-                        elif isinstance(doc_value, list):
-                            if value not in doc_value:
-                                return False
-                        else:
-                            return False
+                    predicate = QueryEngine.compile_operator(path, op, value)
+                    if predicate is not None:
+                        predicates.append(predicate)
+            elif field == "tags" or field == "_tags":
+                # Special handling for tags - check if tag is in array
+                def has_tag(doc, tag=condition, get_tags=_getter(("_tags",))):
+                    tags = get_tags(doc)
+                    return tags is not None and tag in tags
+                predicates.append(has_tag)
             else:
-                # Direct equality or array contains
-                if field == "tags" or field == "_tags":
-                    # Special handling for tags - check if tag is in array
-                    tags = doc.get("_tags", [])
-                    if condition not in tags:
-                        return False
-                else:
-                    # Direct equality
-                    if doc_value != condition:
-                        return False
+                # Direct equality
+                predicates.append(QueryEngine.compile_operator(path, "$eq", condition))
+        return predicates, query_dict.get("$limit")
+
+    @staticmethod
+    def compile_needles(query_dict):
+        """Byte strings a stored row must contain to possibly match the query.
+
+        Returns a list of groups; a row can only match if each group has at
+        least one needle in its raw JSON, so other rows skip json.loads.
+        """
+        needles = []
+        for field, condition in query_dict.items():
+            if field.startswith("$"):
+                continue
+            if not isinstance(condition, dict):
+                # Tag membership may be a substring test, so tags match unquoted
+                needle = _plain_needle(condition, field != "tags" and field != "_tags")
+                if needle is not None:
+                    needles.append((needle,))
+                continue
+            for op, value in condition.items():
+                if op == "$eq" or op == "$contains":
+                    needle = _plain_needle(value, op == "$eq")
+                    if needle is not None:
+                        needles.append((needle,))
+                elif op == "$in" and isinstance(value, (list, tuple)):
+                    group = [_plain_needle(v, True) for v in value]
+                    if None not in group:
+                        needles.append(tuple(group))
+        return needles
+
+    @staticmethod
+    def matches_query(doc, query_dict):
+        """Check if document matches query conditions"""
+        predicates, _ = QueryEngine.compile_query(query_dict)
+        for predicate in predicates:
+            if not predicate(doc):
+                return False
         return True
-    
+
     @staticmethod
     async def execute_query(db, query_dict):
         """Execute query against database"""
         results = []
-        limit = query_dict.get("$limit")
-        
+        predicates, limit = QueryEngine.compile_query(query_dict)
+        needles = QueryEngine.compile_needles(query_dict)
+
         try:
-            keys = list(db.keys(None, None, btree.INCL))
-            for key in keys:
+            for raw_data in db.values(None, None, btree.INCL):
+                if needles and not _may_match(raw_data, needles):
+                    continue
                 try:
-                    key_str = key.decode()
-                    raw_data = db[key]
-                    doc = json.loads(raw_data.decode())
-                    
-                    if QueryEngine.matches_query(doc, query_dict):
-                        results.append(doc)
-                        if limit and len(results) >= limit:
-                            break
-                            
-                except (UnicodeDecodeError, json.JSONDecodeError, KeyError):
+                    doc = decode_value(raw_data)
+                except ValueError:
                     continue
-                    
+
+                for predicate in predicates:
+                    if not predicate(doc):
+                        break
+                else:
+                    results.append(doc)
+                    if limit and len(results) >= limit:
+                        break
+
         except Exception as e:
             print(f"Query error: {e}")
-            
-        return results 
\ No newline at end of file
+
+        return results
@@ -1,103 +1,161 @@
+import asyncio
 import time
 import heapq
 
+from .key_generator import _parse_ttl_fields
+from .utils import ticks_diff as _ticks_diff, ticks_ms as _ticks_ms
+
+_time = time.time  # Bound once for the per-tick and per-put callers below
+_EXPIRY_CHUNK = 32  # Expired keys deleted between yields to the event loop
+
 
 class TTLManager:
     """Manages TTL (Time-To-Live) functionality for database keys"""
     
     def __init__(self):
         self._ttl_index = []  # Min-heap of (expiry_time, key) tuples
-        self._last_ttl_check = 0
+        self._valid = {}  # key -> expiry_time of its live heap entry; others are stale
+        self._last_ttl_check = None  # ticks_ms of the last check; None means due now
     
     def rebuild_index(self, db_keys):
         """Rebuild TTL index from existing database keys"""
         self._ttl_index = []
+        self._valid = {}
         try:
             for key_bytes in db_keys:
                 try:
                     key_str = key_bytes.decode()
                     expiry_time = self.get_expiry_time(key_str)
                     if expiry_time is not None:  # Has TTL
-                        heapq.heappush(self._ttl_index, (expiry_time, key_str))
+                        self._ttl_index.append((expiry_time, key_str))
+                        self._valid[key_str] = expiry_time
                 except (UnicodeDecodeError, ValueError):
                     continue
         except Exception as e:
             print(f"Warning: Failed to rebuild TTL index: {e}")
+        # One O(n) heapify instead of a heappush per key
+        heapq.heapify(self._ttl_index)
     
     def get_expiry_time(self, key):
         """Get expiry timestamp for a key, or None if no TTL"""
+        expiry_time = self._valid.get(key)
+        if expiry_time is not None:
+            return expiry_time  # Indexed keys need no parsing
         try:
-            timestamp_str, ttl_str, _ = key.split(":")
-            timestamp = int(timestamp_str)
-            ttl = int(ttl_str)
+            timestamp, ttl = _parse_ttl_fields(key)
             if ttl == 0:
                 return None  # No TTL
             return timestamp + ttl
         except (ValueError, IndexError):
             return None
     
-    def add_to_index(self, key, ttl):
+    def add_to_index(self, key, ttl, now=None):
         """Add a key with TTL to the index"""
         if ttl and ttl > 0:
-            current_time = int(time.time())
+            current_time = int(_time() if now is None else now)
             expiry_time = current_time + int(ttl)
             heapq.heappush(self._ttl_index, (expiry_time, key))
+            self._valid[key] = expiry_time
+        elif self._valid:
+            self._valid.pop(key, None)  # Overwritten without a TTL
     
     def remove_from_index(self, key):
         """Remove a key from TTL index (lazy removal - will be cleaned up during check)"""
         # Note: We don't actively remove from heap as it's expensive
-        # Instead, we'll check if key exists when processing the heap
-        pass
+        # Instead, its heap entry goes stale and is skipped when popped
+        self._valid.pop(key, None)
     
     def is_expired(self, key):
         """Check if a key is expired based on its embedded TTL"""
+        expiry_time = self._valid.get(key)
+        if expiry_time is not None:
+            return int(_time()) > expiry_time
         try:
-            timestamp_str, ttl_str, _ = key.split(":")
-            timestamp = int(timestamp_str)
-            ttl = int(ttl_str)
-            if ttl == 0:
-                return False
-            current_time = int(time.time())
-            return current_time > (timestamp + ttl)
+            timestamp, ttl = _parse_ttl_fields(key)
+            return ttl != 0 and int(_time()) > timestamp + ttl
         except (ValueError, IndexError):
             return True
     
-    async def check_expiry(self, db, flush_callback=None):
-        """Check and remove expired items from TTL index - much more efficient"""
+    async def check_expiry(self, db, flush_callback=None, now=None, max_work=64):
+        """Remove up to max_work expired items (None for all), yielding between chunks"""
         if not self._ttl_index:
             return 0
             
-        current_time = int(time.time())
+        current_time = int(_time() if now is None else now)
         deleted = 0
-        
-        # Process expired items from the front of the heap
-        while self._ttl_index and self._ttl_index[0][0] <= current_time:
-            expiry_time, key = heapq.heappop(self._ttl_index)
-            
-            # Check if key still exists (handles lazy deletion)
-            key_bytes = key.encode()
-            if key_bytes in db:
-                # Double-check expiry in case of clock changes
-                if self.is_expired(key):
-                    try:
-                        del db[key_bytes]
-                        deleted += 1
-                    except KeyError:
-                        pass  # Already deleted
+        while max_work is None or deleted < max_work:
+            limit = _EXPIRY_CHUNK
+            if max_work is not None and max_work - deleted < limit:
+                limit = max_work - deleted
+            count = self.pop_expired(db, limit, current_time)
+            deleted += count
+            if count < limit or not self._ttl_index:
+                break
+            if max_work is None or deleted < max_work:
+                # A large backlog is swept in chunks so other tasks keep running
+                await asyncio.sleep(0)
+        else:
+            if self._ttl_index and self._ttl_index[0][0] <= current_time:
+                self._last_ttl_check = None  # Budget spent with work left; due again next tick
         
         if deleted > 0 and flush_callback:
             flush_callback()
             
         return deleted
     
+    def pop_expired(self, db, limit=None, now=None):
+        """Delete up to limit expired keys right away, regardless of the check interval"""
+        current_time = int(_time() if now is None else now)
+        expired = []
+        # Bind the per-iteration lookups once; attribute access is slow on MicroPython
+        index = self._ttl_index
+        valid = self._valid
+        pop = heapq.heappop
+        
+        # Collect expired items from the front of the heap
+        while index and index[0][0] <= current_time:
+            if limit is not None and len(expired) >= limit:
+                break
+            expiry_time, key = pop(index)
+            
+            # Skip entries for keys deleted or re-put since (lazy deletion)
+            if valid.get(key) != expiry_time:
+                continue
+            # The popped expiry is timestamp + ttl, so it's due; no need to re-parse the key
+            del valid[key]
+            expired.append(key)
+        
+        # Then delete them back to back, ahead of a single flush
+        deleted = 0
+        for key in expired:
+            try:
+                del db[key]  # btree takes str keys directly; no encoded copy
+                deleted += 1
+            except KeyError:
+                pass  # Already deleted
+        return deleted
+    
     def should_check_ttl(self, ttl_check_interval):
         """Check if it's time to run TTL expiry check"""
-        current_time = time.time()
-        if (current_time - self._last_ttl_check) >= ttl_check_interval:
-            self._last_ttl_check = current_time
-            return True
-        return False
-    
+        # Integer ticks keep this per-tick check free of float allocations
+        current_ticks = _ticks_ms()
+        last = self._last_ttl_check
+        if last is not None:
+            elapsed = _ticks_diff(current_ticks, last)
+            # A gap past half the ticks period (~6.2 days) wraps negative; it is overdue
+            if 0 <= elapsed < ttl_check_interval * 1000:
+                return False
+        self._last_ttl_check = current_ticks
+        return True
+
+    def seconds_until_check(self, ttl_check_interval):
+        """Seconds left until the next TTL expiry check is due"""
+        if self._last_ttl_check is None:
+            return 0
+        elapsed = _ticks_diff(_ticks_ms(), self._last_ttl_check)
+        remaining = ttl_check_interval * 1000 - elapsed
+        return remaining / 1000 if remaining > 0 and elapsed >= 0 else 0
+
     @property
     def index_size(self):
         """Get the current size of the TTL index"""
@@ -1,17 +1,54 @@
+import json
 import os
+import time
+
+try:
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    # CPython has no ticks API; milliseconds since the epoch behave the same here
+    def ticks_ms():
+        return int(time.time() * 1000)
+
+    def ticks_diff(end, start):
+        return end - start
+
+
+_dumps = json.dumps  # Bound once; encode/decode run on every put, get and query row
+_loads = json.loads
+_SEPARATORS = (",", ":")  # No padding spaces in stored rows
+
+
+def encode_value(data):
+    """Serialize a document into the bytes stored in the btree"""
+    return _dumps(data, separators=_SEPARATORS).encode()
+
+
+def decode_value(raw_data):
+    """Deserialize a stored btree value back into a document"""
+    return _loads(raw_data)
+
 
 def ensure_dirs(path):
     if "/" not in path:
         return
     if not path.startswith("/"):
         path = "/" + path
-    parts = path.split("/")
-    curr_path = ""
-    for i in range(len(parts) - 1):
-        part = parts[i]
-        if part:
-            curr_path += "/" + part
+    parent = path[:path.rfind("/")]
+    if parent:
+        try:
+            os.stat(parent)
+            return  # Usual case: the directory is already there
+        except OSError:
+            pass
+    # Walk the separators in place; each prefix is a single slice of path
+    start = 1
+    end = path.find("/", start)
+    while end >= 0:
+        if end > start:  # Skip empty segments from repeated slashes
             try:
-                os.mkdir(curr_path)
+                os.mkdir(path[:end])
             except OSError:
                 pass
+        start = end + 1
+        end = path.find("/", start)
@@ -2,7 +2,6 @@ import asyncio
 from collections import deque
 import gc
 import io
-import json
 import time
 import os
 
@@ -10,7 +9,7 @@ import btree
 
 from .core.future import Future
 from .core.exceptions import DBLock
-from .core.utils import ensure_dirs
+from .core.utils import ensure_dirs, encode_value, decode_value
 from .core.ttl_manager import TTLManager
 from .core.query_engine import QueryEngine
 from .core.flush_manager import FlushManager
@@ -20,7 +19,7 @@ from .core.key_generator import KeyGenerator
 class MicroTetherDB:
     def __init__(self, filename="microtether.db", in_memory=True, ram_percentage=15,
                  max_retries=3, retry_delay=0.1, lock_timeout=5.0,
-                 ttl_check_interval=60, btree_cachesize=32, btree_pagesize=512, adaptive_threshold=True,
+                 ttl_check_interval=60, btree_cachesize=None, btree_pagesize=None, adaptive_threshold=True,
                  event_loop=None):
         self.filename = filename
         self.in_memory = in_memory
@@ -30,6 +29,9 @@ class MicroTetherDB:
         self.lock_timeout = lock_timeout
 
         self.ttl_check_interval = ttl_check_interval
+        if btree_pagesize is not None and (
+                btree_pagesize < 512 or btree_pagesize > 65536 or btree_pagesize & (btree_pagesize - 1)):
+            raise ValueError("btree_pagesize must be a power of two between 512 and 65536")
         self.btree_cachesize = btree_cachesize
         self.btree_pagesize = btree_pagesize
         self.adaptive_threshold = adaptive_threshold
@@ -37,10 +39,22 @@ class MicroTetherDB:
         # Core components
         self._db = None
         self._db_handle = None
-        self._lock = None  # Will be initialized when we have a loop
+        self._busy = False  # Set while a handler touches the btree
+        self._draining = False  # Set while a drain holds popped entries across a yield
+        self._has_work = None  # Set by enqueue paths to wake the worker
         self._worker = None
         self._running = False
-        self._queue = deque((), 50)
+        self._queue_size = 50
+        self._queue = deque((), self._queue_size)
+        # Every handler takes (first_arg, now=..., **kwargs) from a queue entry
+        self._dispatch = {
+            "put": self._put,
+            "get": self._get,
+            "delete": self._delete,
+            "query": self._query,
+            "put_batch": self._put_batch,
+            "delete_batch": self._delete_batch,
+        }
 
         # Event loop handling - be more careful about when we get it
         self._loop = event_loop
@@ -61,6 +75,12 @@ class MicroTetherDB:
                 print("Warning: Not enough memory for in-memory storage. Falling back to file-based storage.")
                 self.in_memory = False
                 self._flush_manager = FlushManager(adaptive_threshold, False)
+                # RAM is already short, so skip the 4KiB flash pages and their cache
+                if btree_pagesize is None:
+                    self.btree_pagesize = 512
+                if btree_cachesize is None:
+                    self.btree_cachesize = 32
+                gc.collect()  # Reclaim the failed attempt's buffers before retrying
                 self._init_db()
                 if self._loop_provided or self._is_async_context():
                     self._start_worker()
@@ -88,13 +108,59 @@ class MicroTetherDB:
 
     def _ensure_async_components(self):
         """Ensure async components are initialized"""
-        if self._lock is None:
+        if self._has_work is None:
             self._get_or_create_loop()
-            self._lock = asyncio.Lock()
+            self._has_work = asyncio.Event()
+
+    def _submit(self, operation, args, kwargs):
+        """Run an operation now, or behind any queued entries so order is kept"""
+        self._ensure_async_components()
+        loop = self._get_or_create_loop()
+        if not self._queue and not self._draining:
+            # Nothing queued or mid-drain ahead of this call, so run its handler directly
+            return loop.run_until_complete(self._dispatch[operation](args[0], **kwargs))
+        future = Future()
+        self._enqueue(future, operation, args, kwargs)
+        while not future.done():
+            loop.run_until_complete(self._drain_step())
+        return future.result()
+
+    def _enqueue(self, future, operation, args, kwargs):
+        while len(self._queue) >= self._queue_size:
+            # A full deque silently drops its oldest entry, so drain it first
+            self._get_or_create_loop().run_until_complete(self._drain_step())
+        self._queue.append((future, operation, args, kwargs))
+        self._has_work.set()
+
+    async def _drain_step(self):
+        """Drain the queue, or yield to a drain that another task has suspended"""
+        if self._draining:
+            await asyncio.sleep(0)
+        else:
+            await self._process_next()
+
+    def _ram_budget(self):
+        """Bytes of free RAM this database may use, per ram_percentage"""
+        if not hasattr(gc, "mem_free"):
+            return 1 << 30  # CPython has no gc.mem_free; treat RAM as plentiful
+        # mem_free excludes uncollected garbage, which would understate the budget
+        gc.collect()
+        return gc.mem_free() * self.ram_percentage // 100
+
+    def _open_btree(self):
+        pagesize = self.btree_pagesize
+        if pagesize is None:
+            # Flash erase blocks are 4KiB; RAM-backed databases grow a page at a time
+            pagesize = 1024 if self.in_memory else 4096
+            if self.in_memory and self._ram_budget() < 16384:
+                pagesize = 512  # Small RAM budgets can't spare half-empty 1KiB pages
+        cachesize = self.btree_cachesize
+        if cachesize is None:
+            cachesize = 4 * pagesize  # btree cachesize is in bytes, not pages
+        return btree.open(self._db_handle, cachesize=cachesize, pagesize=pagesize)
 
     def _init_db(self):
         try:
-            gc.collect()
             if self.in_memory:
                 self._db_handle = io.BytesIO()
             else:
@@ -105,23 +171,14 @@ class MicroTetherDB:
                 except OSError:
                     self._db_handle = open(self.filename, "w+b")
             try:
-                self._db = btree.open(
-                    self._db_handle,
-                    cachesize=self.btree_cachesize,
-                    pagesize=self.btree_pagesize
-                )
-                try:
-                    next(self._db.keys(None, None, btree.INCL))
-                except StopIteration:
-                    pass
-                except Exception as e:
-                    print(f"Warning: Database verification failed: {e}")
+                self._db = self._open_btree()
             except Exception as e:
                 print(f"Error creating btree database: {e}")
                 raise
-            # Build TTL index from existing data
-            keys = list(self._db.keys(None, None, btree.INCL))
-            self._ttl_manager.rebuild_index(keys)
+            if not self.in_memory:
+                # Build TTL index by streaming the btree cursor, not a list of every key;
+                # a fresh BytesIO database has no keys to index
+                self._ttl_manager.rebuild_index(self._db.keys(None, None, btree.INCL))
 
             # Database initialization complete
         except Exception as e:
@@ -139,22 +196,33 @@ class MicroTetherDB:
         self._worker = loop.create_task(self._worker_task())
 
     async def _worker_task(self):
+        # The queue and event live as long as the database; the TTL manager and
+        # btree are replaced by purge, so those are still read through self
+        queue = self._queue
+        has_work = self._has_work
         try:
             while self._running:
                 try:
-                    current_time = time.time()
-
-                    # TTL expiry checks
+                    # TTL expiry checks; the interval is timed in ticks, so the
+                    # wall clock is only read when a check actually runs
                     if self._ttl_manager.should_check_ttl(self.ttl_check_interval):
                         await self._ttl_manager.check_expiry(
                             self._db,
                             lambda: self._db.flush()
                         )
 
-                    if not self._queue:
-                        await asyncio.sleep(0.01)
+                    if not queue:
+                        # Sleep until an enqueue wakes us or the next TTL check is due
+                        has_work.clear()
+                        try:
+                            await asyncio.wait_for(
+                                has_work.wait(),
+                                self._ttl_manager.seconds_until_check(self.ttl_check_interval)
+                            )
+                        except asyncio.TimeoutError:
+                            pass
                         continue
-                    await self._process_next()
+                    await self._drain_step()
                 except Exception as e:
                     print(f"Worker error: {e}")
                     await asyncio.sleep(0.01)
@@ -162,102 +230,165 @@ class MicroTetherDB:
             pass
 
     async def _process_next(self):
-        if not self._queue:
+        queue = self._queue
+        if not queue or self._draining:
             return
-        future, operation, args, kwargs = self._queue.popleft()
+        # Popped entries are invisible to the fast paths until they resolve,
+        # so the flag holds them off while this drain yields below
+        self._draining = True
         try:
-            if operation == "put":
-                result = await self._put(args[0], **kwargs)
-            elif operation == "get":
-                result = await self._get(args[0])
-            elif operation == "delete":
-                result = await self._delete(args[0], **kwargs)
-            elif operation == "query":
-                result = await self._query(args[0])
-            elif operation == "put_batch":
-                result = await self._put_batch(args[0], ttls=kwargs.get("ttls"))
-            elif operation == "delete_batch":
-                result = await self._delete_batch(args[0])
+            popleft = queue.popleft
+            while queue:
+                batch = []
+                while queue:
+                    batch.append(popleft())
+                await self._process_batch(batch)
+        finally:
+            self._draining = False
+
+    async def _process_batch(self, batch):
+        # One clock read serves every operation in this batch
+        now = time.time()
+        i = 0
+        count = len(batch)
+        yielded_at = 0
+        process_run = self._process_run
+        process_one = self._process_one
+        while i < count:
+            if i - yielded_at >= 16:
+                # Let other tasks run during a long drain
+                await asyncio.sleep(0)
+                yielded_at = i
+            operation = batch[i][1]
+            end = i + 1
+            # Runs of consecutive puts/deletes are committed together
+            if operation == "put" or (operation == "delete" and not batch[i][3].get("purge")):
+                while (end < count and batch[end][1] == operation
+                       and not batch[end][3].get("purge")):
+                    end += 1
+            if end - i > 1:
+                await process_run(batch[i:end], now)
             else:
+                await process_one(*batch[i], now=now)
+            i = end
+
+    async def _process_one(self, future, operation, args, kwargs, now=None):
+        try:
+            handler = self._dispatch.get(operation)
+            if handler is None:
                 raise ValueError(f"Unknown operation: {operation}")
-            future.set_result(result)
+            future.set_result(await handler(args[0], now=now, **kwargs))
         except Exception as e:
             future.set_exception(e)
 
-    async def _acquire_lock(self):
+    async def _process_run(self, run, now=None):
+        """Commit a run of queued puts or deletes under one lock and flush check"""
         try:
-            if self._lock.locked():
-                raise DBLock("Database is already locked")
-            await self._lock.acquire()
-        except asyncio.TimeoutError:
-            raise DBLock("Database is locked. Operation timed out.")
+            if run[0][1] == "put":
+                await self._put_run(run, now)
+            else:
+                await self._delete_run(run, now)
         except Exception as e:
-            raise DBLock(f"Failed to acquire lock: {str(e)}")
+            for future, _, _, _ in run:
+                if not future.done():
+                    future.set_exception(e)
 
-    async def _put(self, data, ttl=None, tags=None, key=None):
+    def _acquire_lock(self):
+        # Handlers never suspend while holding this, and the worker runs them one
+        # at a time, so a flag guards re-entry without an asyncio.Lock round trip
+        if self._busy:
+            raise DBLock("Database is already locked")
+        self._busy = True
+
+    def _release_lock(self):
+        self._busy = False
+
+    def _write(self, key, encoded_data, now=None):
         try:
-            await self._acquire_lock()
-            try:
-                if key is None:
-                    key = KeyGenerator.generate_key(ttl)
-                    while key in self._db:
-                        key = KeyGenerator.generate_key(ttl)
-                else:
-                    key = str(key)
-                key_bytes = key.encode()
-                if tags:
-                    data["_tags"] = tags
-                json_data = json.dumps(data)
-                if len(json_data) > 8192:  # 8KB limit
-                    raise ValueError("Data too large: maximum size is 8KB after JSON serialization")
-                encoded_data = json_data.encode()
-                try:
-                    self._db[key_bytes] = encoded_data
-                    # Add to TTL index if has TTL
-                    self._ttl_manager.add_to_index(key, ttl)
-                except Exception:
-                    raise
+            self._db[key] = encoded_data
+        except (OSError, MemoryError):
+            # Out of space: reclaim expired records before failing the write
+            if not self._ttl_manager.pop_expired(self._db, now=now):
+                raise
+            self._db[key] = encoded_data
+
+    def _new_key(self, ttl, now):
+        key = KeyGenerator.generate_key(ttl, now)
+        if not self.in_memory:
+            # A file may hold keys from an earlier boot with the same clock and counter
+            while key in self._db:
+                key = KeyGenerator.generate_key(ttl, now)
+        return key
+
+    def _store(self, data, ttl=None, tags=None, key=None, now=None):
+        if key is None:
+            key = self._new_key(ttl, now)
+        else:
+            key = str(key)
+        key_bytes = key.encode()
+        if tags:
+            data["_tags"] = tags
+        encoded_data = encode_value(data)
+        if len(encoded_data) > 8192:  # 8KB limit
+            raise ValueError("Data too large: maximum size is 8KB after JSON serialization")
+        self._write(key_bytes, encoded_data, now)
+        # Add to TTL index if has TTL
+        self._ttl_manager.add_to_index(key, ttl, now)
+        return key
+
+    async def _put(self, data, ttl=None, tags=None, key=None, now=None):
+        self._acquire_lock()
+        try:
+            key = self._store(data, ttl, tags, key, now)
+            self._flush_manager.record_put()
+            self._flush_manager.flush_if_needed(self._db)
+            return key
+        finally:
+            self._release_lock()
 
-                self._flush_manager.record_operation("put")
-                self._flush_manager.flush_if_needed(self._db)
-                return key
-            finally:
-                self._lock.release()
-        except Exception as e:
-            raise
+    async def _put_run(self, run, now=None):
+        self._acquire_lock()
+        try:
+            outcomes = []
+            for future, _, args, kwargs in run:
+                try:
+                    outcomes.append((future, self._store(args[0], now=now, **kwargs), None))
+                    self._flush_manager.record_put()
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            self._flush_manager.flush_if_needed(self._db)
+        finally:
+            self._release_lock()
+        for future, key, error in outcomes:
+            if error is None:
+                future.set_result(key)
+            else:
+                future.set_exception(error)
 
-    async def _get(self, key):
+    async def _get(self, key, now=None):
         if not self._db or not self._db_handle:
             return None
         try:
-            await self._acquire_lock()
+            self._acquire_lock()
             try:
-                key_bytes = key.encode() if isinstance(key, str) else key
                 try:
-                    raw_data = self._db[key_bytes]
-                    return json.loads(raw_data.decode())
+                    raw_data = self._db[key]  # btree takes str keys; no encoded copy
                 except KeyError:
                     return None
-                except Exception as e:
-                    raise
+                return decode_value(raw_data)
             finally:
-                self._lock.release()
+                self._release_lock()
         except Exception as e:
             if isinstance(e, DBLock):
                 return None
             raise
 
-    async def _delete(self, key, purge=False):
-        await self._acquire_lock()
+    async def _delete(self, key, purge=False, now=None):
+        self._acquire_lock()
         try:
             if purge:
-                # Close current database and file handle
-                if self._db:
-                    try:
-                        self._db.flush()
-                    except Exception:
-                        pass
-                    self._db = None
+                # Drop the current database unflushed; its pages are discarded anyway
+                self._db = None
                 if self._db_handle:
                     try:
                         self._db_handle.close()
@@ -278,11 +409,7 @@ class MicroTetherDB:
                     ensure_dirs(self.filename)
                     self._db_handle = open(self.filename, "w+b")
                 try:
-                    self._db = btree.open(
-                        self._db_handle,
-                        cachesize=self.btree_cachesize,
-                        pagesize=self.btree_pagesize
-                    )
+                    self._db = self._open_btree()
                 except Exception as e:
                     raise ValueError(f"Failed to recreate database: {e}")
                 # Clear TTL index and flush manager
@@ -290,154 +417,158 @@ class MicroTetherDB:
                 self._flush_manager.reset_counters()
                 return 1  # Return 1 to indicate success
 
-            key_bytes = key.encode() if isinstance(key, str) else key
-            if key_bytes in self._db:
-                del self._db[key_bytes]
-                # Remove from TTL index (lazy removal)
-                self._ttl_manager.remove_from_index(key)
-                self._flush_manager.record_operation("delete")
+            if self._remove(key):
+                self._flush_manager.record_delete()
                 self._flush_manager.flush_if_needed(self._db)
                 return 1
             return 0
         finally:
-            self._lock.release()
+            self._release_lock()
+
+    def _remove(self, key):
+        try:
+            del self._db[key]  # btree takes str keys; a miss raises KeyError
+        except KeyError:
+            return False
+        # Remove from TTL index (lazy removal)
+        self._ttl_manager.remove_from_index(key)
+        return True
+
+    async def _delete_run(self, run, now=None):
+        self._acquire_lock()
+        try:
+            outcomes = []
+            for future, _, args, _ in run:
+                try:
+                    if self._remove(args[0]):
+                        self._flush_manager.record_delete()
+                        outcomes.append((future, 1, None))
+                    else:
+                        outcomes.append((future, 0, None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            self._flush_manager.flush_if_needed(self._db)
+        finally:
+            self._release_lock()
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
 
-    async def _query(self, query_dict):
-        await self._acquire_lock()
+    async def _query(self, query_dict, now=None):
+        self._acquire_lock()
         try:
             return await QueryEngine.execute_query(self._db, query_dict)
         finally:
-            self._lock.release()
+            self._release_lock()
 
-    async def _put_batch(self, items, ttls=None):
-        await self._acquire_lock()
+    async def _put_batch(self, items, ttls=None, now=None):
+        self._acquire_lock()
         try:
             if not items:
                 return []
+            ttl_list = None
             if ttls is None:
-                ttl_list = [0] * len(items)
+                item_ttl = 0
             elif isinstance(ttls, (int, float)):
-                ttl_list = [int(ttls)] * len(items)
+                item_ttl = int(ttls)
             elif isinstance(ttls, list):
                 if len(ttls) != len(items):
                     raise ValueError("TTL list must match the number of items")
                 ttl_list = [int(t) for t in ttls]
             else:
                 raise ValueError("TTL must be an integer, float, or list of numbers")
+            if now is None:
+                now = time.time()
+            # A shared TTL gets all its keys from one prefix up front; file-backed
+            # databases probe each key instead, as keys from an earlier boot can repeat
+            keys = None
+            if ttl_list is None and self.in_memory:
+                keys = KeyGenerator.generate_keys(len(items), item_ttl, now)
             batch_keys = []
-            for item, item_ttl in zip(items, ttl_list):
+            # Bound once for the per-item loop below
+            write = self._write
+            add_to_index = self._ttl_manager.add_to_index
+            for i, item in enumerate(items):
                 if not isinstance(item, dict):
                     continue
-                json_data = json.dumps(item)
-                if len(json_data) > 8192:  # 8KB limit
+                if ttl_list is not None:
+                    item_ttl = ttl_list[i]
+                encoded_data = encode_value(item)
+                if len(encoded_data) > 8192:  # 8KB limit
                     continue
-                key = KeyGenerator.generate_key(int(item_ttl))
-                encoded_data = json_data.encode()
-                self._db[key] = encoded_data
+                if keys is None:
+                    key = self._new_key(item_ttl, now)
+                else:
+                    key = keys[i]
+                write(key, encoded_data, now)
                 # Add to TTL index if has TTL
-                self._ttl_manager.add_to_index(key, item_ttl)
+                add_to_index(key, item_ttl, now)
                 batch_keys.append(key)
 
-            self._flush_manager.record_operation("batch_put", len(batch_keys))
+            self._flush_manager.record_batch_put(len(batch_keys))
             self._flush_manager.flush_if_needed(self._db)
             return batch_keys
         finally:
-            self._lock.release()
+            self._release_lock()
 
     def delete_batch(self, keys):
-        self._ensure_async_components()
-        if not isinstance(keys, list):
-            if hasattr(keys, '__iter__'):
-                keys = list(keys)
-            else:
-                keys = [keys]
-        future = Future()
-        self._queue.append((future, "delete_batch", (keys,), {}))
-        if len(self._queue) == 1:
-            loop = self._get_or_create_loop()
-            loop.run_until_complete(self._process_next())
-        result = future.result()
+        if not hasattr(keys, '__iter__'):
+            keys = [keys]
+        # Keys are normalised here once, so the handler can use them as given
+        keys = [key if isinstance(key, str) else str(key) for key in keys]
+        result = self._submit("delete_batch", (keys,), {})
         return result if result is not None else 0
 
-    async def _delete_batch(self, keys):
-        await self._acquire_lock()
+    async def _delete_batch(self, keys, now=None):
+        self._acquire_lock()
         try:
-            if not isinstance(keys, list):
-                if hasattr(keys, '__iter__'):
-                    keys = list(keys)
-                else:
-                    keys = [keys]
             deleted_count = 0
             for key in keys:
-                if not isinstance(key, str):
-                    key = str(key)
-                if key in self._db:
-                    del self._db[key]
-                    deleted_count += 1
+                try:
+                    del self._db[key]  # One btree lookup; a miss raises KeyError
+                except KeyError:
+                    continue
+                self._ttl_manager.remove_from_index(key)
+                deleted_count += 1
 
-            self._flush_manager.record_operation("batch_delete", deleted_count)
+            self._flush_manager.record_batch_delete(deleted_count)
             self._flush_manager.flush_if_needed(self._db)
             return deleted_count
         finally:
-            self._lock.release()
+            self._release_lock()
 
 
 
     # Public API methods
     def put(self, *args, **kwargs):
-        self._ensure_async_components()
         if len(args) == 2:
             key, data = args
             kwargs['key'] = key
             data_arg = data
         else:
             data_arg = args[0] if args else {}
-        future = Future()
-        self._queue.append((future, "put", (data_arg,), kwargs))
-        if len(self._queue) == 1:
-            loop = self._get_or_create_loop()
-            loop.run_until_complete(self._process_next())
-        return future.result()
+        return self._submit("put", (data_arg,), kwargs)
 
     def get(self, key):
-        self._ensure_async_components()
-        future = Future()
-        try:
-            self._queue.append((future, "get", (key,), {}))
-            if len(self._queue) == 1:
-                loop = self._get_or_create_loop()
-                loop.run_until_complete(self._process_next())
-            result = future.result()
-            return result
-        except Exception as e:
-            raise
+        if (not self._queue and not self._draining and not self._busy
+                and self._db and self._db_handle):
+            # Nothing queued or mid-drain ahead: read without a loop round trip
+            try:
+                return decode_value(self._db[key])
+            except KeyError:
+                return None
+        return self._submit("get", (key,), {})
 
     def delete(self, key=None, purge=False):
-        self._ensure_async_components()
-        future = Future()
-        self._queue.append((future, "delete", (key,), {"purge": purge}))
-        if len(self._queue) == 1:
-            loop = self._get_or_create_loop()
-            loop.run_until_complete(self._process_next())
-        return future.result()
+        return self._submit("delete", (key,), {"purge": purge})
 
     def query(self, query_dict):
-        self._ensure_async_components()
-        future = Future()
-        self._queue.append((future, "query", (query_dict,), {}))
-        if len(self._queue) == 1:
-            loop = self._get_or_create_loop()
-            loop.run_until_complete(self._process_next())
-        return future.result()
+        return self._submit("query", (query_dict,), {})
 
     def put_batch(self, items, ttls=None):
-        self._ensure_async_components()
-        future = Future()
-        self._queue.append((future, "put_batch", (items,), {"ttls": ttls}))
-        if len(self._queue) == 1:
-            loop = self._get_or_create_loop()
-            loop.run_until_complete(self._process_next())
-        return future.result()
+        return self._submit("put_batch", (items,), {"ttls": ttls})
 
     # Context managers
     async def __aenter__(self):
@@ -518,7 +649,7 @@ class MicroTetherDB:
             deleted = 0
             # The TTLManager's check_expiry is async, but we can run it synchronously for now
             # (since the worker is not running in sync context)
-            coro = self._ttl_manager.check_expiry(self._db, self._db.flush)
+            coro = self._ttl_manager.check_expiry(self._db, self._db.flush, max_work=None)
             if hasattr(coro, '__await__'):
                 # Run the coroutine synchronously
                 try:
@@ -1,6 +1,9 @@
+import json
 import time
+import asyncio
 import btree
 from tendrl.lib.microtetherdb.db import MicroTetherDB
+from tendrl.lib.microtetherdb.core.future import Future
 
 def test_read_write_consistency():
     """Test that reads see unflushed writes immediately"""
@@ -110,6 +113,187 @@ def test_read_write_consistency():
     finally:
         db.close()
 
+def test_coalesced_queue_consistency():
+    """Test that queued puts/deletes committed as one run stay consistent"""
+    print("\nTesting Coalesced Queue Consistency...")
+
+    db = MicroTetherDB(in_memory=True)
+
+    try:
+        loop = asyncio.get_event_loop()
+        db._ensure_async_components()
+
+        print("1. Queueing a run of puts...")
+        put_futures = []
+        for i in range(5):
+            future = Future()
+            db._queue.append((future, "put", ({"item": i},), {}))
+            put_futures.append(future)
+        # A malformed put in the middle of the run must only fail its own future
+        bad_future = Future()
+        db._queue.append((bad_future, "put", ({"blob": "x" * 9000},), {}))
+        loop.run_until_complete(db._process_next())
+
+        keys = [future.result() for future in put_futures]
+        assert all(future.done() for future in put_futures), "All put futures should resolve"
+        assert bad_future.done(), "Oversized put should resolve with an error"
+        try:
+            bad_future.result()
+            assert False, "Oversized put should raise"
+        except ValueError:
+            pass
+        for i, key in enumerate(keys):
+            assert db.get(key)["item"] == i, f"Coalesced item {i} should be readable"
+
+        print("2. Queueing a run of deletes...")
+        delete_futures = []
+        for key in (keys[0], None, keys[1], "missing_key"):
+            future = Future()
+            db._queue.append((future, "delete", (key,), {"purge": False}))
+            delete_futures.append(future)
+        loop.run_until_complete(db._process_next())
+
+        # An invalid key in the middle of the run must only fail its own future
+        bad_future = delete_futures.pop(1)
+        try:
+            bad_future.result()
+            assert False, "Deleting an invalid key should raise"
+        except TypeError:
+            pass
+        assert [f.result() for f in delete_futures] == [1, 1, 0], "Delete results should be per key"
+        assert db.get(keys[0]) is None, "Deleted item should be gone"
+        assert db.get(keys[2]) is not None, "Untouched item should remain"
+
+        print("3. Calling the sync API behind a pending entry...")
+        pending = Future()
+        db._queue.append((pending, "put", ({"item": "pending"},), {}))
+        key = db.put({"item": "sync"})
+        assert pending.done(), "Pending entry should be drained with the sync call"
+        assert key is not None, "Sync put should return its key, not an unresolved result"
+        assert db.get(pending.result())["item"] == "pending", "Pending put should be stored"
+
+        print("✅ Coalesced runs resolve every caller's future")
+        return True
+
+    finally:
+        db.close()
+
+def test_queue_overflow_consistency():
+    """Test that enqueueing past the queue bound never drops queued work"""
+    print("\nTesting Queue Overflow Consistency...")
+
+    db = MicroTetherDB(in_memory=True)
+
+    try:
+        db._ensure_async_components()
+        futures = []
+        for i in range(db._queue_size + 10):
+            future = Future()
+            db._enqueue(future, "put", ({"item": i},), {})
+            futures.append(future)
+        asyncio.get_event_loop().run_until_complete(db._process_next())
+
+        assert all(future.done() for future in futures), "Every queued put should resolve"
+        for i, future in enumerate(futures):
+            assert db.get(future.result())["item"] == i, f"Queued item {i} should be stored"
+
+        print("✅ Full queue drains instead of discarding entries")
+        return True
+
+    finally:
+        db.close()
+
+def test_sync_call_during_worker_drain():
+    """Test that a sync call waits out a drain suspended mid-batch"""
+    print("\nTesting Sync Calls During a Suspended Drain...")
+
+    db = MicroTetherDB(in_memory=True)
+
+    try:
+        loop = asyncio.get_event_loop()
+        db._ensure_async_components()
+        gate = asyncio.Event()
+
+        async def wait_for_gate(_, now=None):
+            await gate.wait()
+            return "released"
+
+        async def release_gate():
+            gate.set()
+
+        db._dispatch["wait"] = wait_for_gate
+        written = []
+        write = db._write
+
+        def record_write(key, encoded_data, now=None):
+            written.append(json.loads(encoded_data)["item"])
+            write(key, encoded_data, now)
+        db._write = record_write
+        futures = []
+        for operation, arg in (("put", {"item": "a"}), ("wait", None), ("put", {"item": "b"})):
+            future = Future()
+            db._enqueue(future, operation, (arg,), {})
+            futures.append(future)
+
+        # Start a drain and let it suspend inside the gated entry
+        drain = loop.create_task(db._process_next())
+        loop.run_until_complete(asyncio.sleep(0))
+        assert db._draining, "Drain should be suspended at the gate"
+        assert not db._queue, "Drain should hold every popped entry"
+
+        loop.create_task(release_gate())
+        key = db.put({"item": "sync"})
+        assert all(future.done() for future in futures), "Popped entries should resolve first"
+        assert written == ["a", "b", "sync"], "Sync put must not overtake the suspended drain"
+        assert key is not None, "Sync put should return its key once resolved"
+        assert db.get(futures[2].result())["item"] == "b", "Entry behind the gate should be stored"
+        assert db.get(key)["item"] == "sync", "Sync put should be stored"
+        loop.run_until_complete(drain)
+
+        print("✅ Sync calls never overtake a suspended drain")
+        return True
+
+    finally:
+        db.close()
+
+def test_generated_keys_survive_restart():
+    """Test that a file DB never reuses a key persisted by an earlier boot"""
+    print("\nTesting Generated Key Uniqueness Across Restarts...")
+
+    import os
+    from tendrl.lib.microtetherdb.core import key_generator
+
+    filename = "restart_keys.db"
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+    db = MicroTetherDB(filename=filename, in_memory=False)
+
+    try:
+        db._ensure_async_components()
+        # Replay the clock and counter a clockless board would start from
+        seq = key_generator._key_seq
+        first = db._store({"boot": 1}, now=946684805)
+        key_generator._key_seq = seq
+        second = db._store({"boot": 2}, now=946684805)
+        key_generator._key_seq = seq
+        batch = db._get_or_create_loop().run_until_complete(
+            db._put_batch([{"boot": 3}], now=946684805))
+
+        assert second != first, "A replayed key must not overwrite the stored record"
+        assert batch[0] not in (first, second), "Batch keys must not overwrite stored records"
+        assert db.get(first)["boot"] == 1, "The earlier record should be intact"
+        print("✅ Replayed keys are skipped in file-backed databases")
+        return True
+
+    finally:
+        db.close()
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
 def test_btree_consistency_directly():
     """Test btree consistency behavior directly"""
     print("\nTesting BTree Consistency Directly...")
@@ -165,7 +349,19 @@ if __name__ == "__main__":
     
     # Test high-level database consistency
     test_read_write_consistency()
+
+    # Test coalesced queue processing
+    test_coalesced_queue_consistency()
+
+    # Test queue overflow handling
+    test_queue_overflow_consistency()
     
+    # Test sync calls racing a suspended worker drain
+    test_sync_call_during_worker_drain()
+
+    # Test key uniqueness across restarts
+    test_generated_keys_survive_restart()
+
     # Test low-level btree consistency
     test_btree_consistency_directly()
     
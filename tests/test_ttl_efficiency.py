@@ -197,6 +197,51 @@ def test_ttl_index_accuracy():
     finally:
         db.close()
 
+def test_ttl_index_skips_stale_entries():
+    """Test that deleted or re-put keys don't expire on their old TTL"""
+    print("\nTesting TTL Index Stale Entries...")
+    
+    db = MicroTetherDB(in_memory=True, ttl_check_interval=1)
+    
+    try:
+        db.put("renewed", {"test": "data"}, ttl=1)
+        db.put("renewed", {"test": "data"}, ttl=3600)  # Re-put with a longer TTL
+        db.put("deleted", {"test": "data"}, ttl=1)
+        db.delete("deleted")
+        db.put("deleted", {"test": "data"})  # Re-put without a TTL
+        
+        time.sleep(3)
+        db._get_or_create_loop().run_until_complete(db._ttl_manager.check_expiry(db._db))
+        
+        assert db.get("renewed") is not None, "Re-put key should keep its new TTL"
+        assert db.get("deleted") is not None, "Re-put key without TTL should not expire"
+        print("✅ Stale TTL entries are skipped")
+        
+    finally:
+        db.close()
+
+def test_ttl_check_budget():
+    """Test that one expiry check removes at most max_work items"""
+    print("\nTesting TTL Check Budget...")
+    
+    db = MicroTetherDB(in_memory=True, ttl_check_interval=1)
+    
+    try:
+        db.put_batch([{"i": i} for i in range(100)], ttls=1)
+        time.sleep(2.5)
+        
+        loop = db._get_or_create_loop()
+        deleted = loop.run_until_complete(db._ttl_manager.check_expiry(db._db, max_work=64))
+        assert deleted == 64, f"Expected 64 deletions within budget, got {deleted}"
+        assert db._ttl_manager.should_check_ttl(db.ttl_check_interval), "Leftover work should be due again"
+        
+        deleted = loop.run_until_complete(db._ttl_manager.check_expiry(db._db, max_work=64))
+        assert deleted == 36, f"Expected remaining 36 deletions, got {deleted}"
+        print("✅ TTL checks stay within their budget")
+        
+    finally:
+        db.close()
+
 def debug_ttl_timing():
     """Debug TTL timing to understand the issue"""
     print("\nDebugging TTL Timing...")
@@ -265,6 +310,8 @@ if __name__ == "__main__":
     # Run tests
     results = test_ttl_efficiency()
     test_ttl_index_accuracy()
+    test_ttl_index_skips_stale_entries()
+    test_ttl_check_budget()
     
     print(f"\n📊 Final Results:")
     print(f"   Total database items: {results['total_items']}")